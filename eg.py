@@ -1,69 +1,238 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import io
+import re
+import datetime
+import xlsxwriter
+
+# The Rust-based calamine reader is much faster than openpyxl; fall back to pandas' default engine without it
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = None
+
+# Arrow's multithreaded CSV reader with Arrow-backed columns; fall back to the default C engine without pyarrow
+try:
+    import pyarrow as pa
+    CSV_READ_OPTIONS = {'engine': 'pyarrow', 'dtype_backend': 'pyarrow'}
+except ImportError:
+    pa = None
+    CSV_READ_OPTIONS = {}
+
+COLLEGE_KW_RE = re.compile(r'college|university|institution|school|uni', re.I)
+
+# Helper column holding the normalized college name, added at load time and never written to the output
+NORM_COLLEGE_COL = '_norm_college'
+
+# Column name prefixes for the two sides of a grouped output row
+HEAD_PREFIX = "Team Head - "
+MEMBER_PREFIX = "Group Member - "
+
+# Rows converted to Python objects at a time when writing the xlsx download
+EXCEL_WRITE_BATCH_ROWS = 10000
+
+# Download format -> (display name, file name, MIME type)
+DOWNLOAD_FORMATS = {
+    'xlsx': ("Excel", "grouped_teams.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'parquet': ("Parquet", "grouped_teams.parquet", "application/octet-stream"),
+    'feather': ("Feather", "grouped_teams.feather", "application/octet-stream"),
+}
+
+def _read_csv(content):
+    """
+    Reads CSV bytes with the pyarrow engine when available. Falls back to the C engine for files
+    Arrow rejects (e.g. short rows, which the C engine pads), cannot decode as UTF-8 (returned as
+    binary columns instead of failing), or that have blank headers, which only the C engine names
+    'Unnamed: N'.
+    """
+    if CSV_READ_OPTIONS:
+        try:
+            df = pd.read_csv(io.BytesIO(content), **CSV_READ_OPTIONS)
+        except (pd.errors.ParserError, pa.ArrowInvalid):
+            pass # Retry with the C engine below
+        else:
+            arrow_types = [dtype.pyarrow_dtype for dtype in df.dtypes if isinstance(dtype, pd.ArrowDtype)]
+            has_binary = any(pa.types.is_binary(t) or pa.types.is_large_binary(t) for t in arrow_types)
+            if not has_binary and '' not in df.columns:
+                return df
 
-def read_excel_file(uploaded_file, sheet_name_input, is_people_file):
+    return pd.read_csv(io.BytesIO(content))
+
+# The parse cache is shared by every session; bound it so large uploads do not stay in memory indefinitely
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def _parse(content, file_name, sheet_name_input):
     """
-    Reads an Excel or CSV file and returns its data as a list of dictionaries,
-    the primary column name, and the auto-detected college column name.
+    Parses the raw bytes of an uploaded Excel or CSV file and auto-detects its columns.
+    Cached on the file content, so Streamlit reruns do not re-read the same upload.
+    Returns the DataFrame, the primary column name, the college column name and an
+    error message, which is empty when parsing succeeded.
     """
     try:
-        file_name = uploaded_file.name
         is_csv = file_name.lower().endswith('.csv')
 
         if is_csv:
-            df = pd.read_csv(uploaded_file)
+            df = _read_csv(content)
         else:
             try:
-                df = pd.read_excel(uploaded_file, sheet_name=sheet_name_input)
+                df = pd.read_excel(io.BytesIO(content), sheet_name=sheet_name_input, engine=EXCEL_ENGINE)
             except ValueError:
-                st.error(f"Sheet '{sheet_name_input}' not found in {file_name}. Please check the sheet name.")
-                return [], '', ''
+                return pd.DataFrame(), '', '', f"Sheet '{sheet_name_input}' not found in {file_name}. Please check the sheet name."
 
         if df.empty:
-            st.error(f"No data found in {file_name}.")
-            return [], '', ''
-
-        # Convert DataFrame to list of dictionaries (records)
-        # Ensure all values are converted to string to avoid issues with mixed types, especially for identifiers
-        json_data = df.astype(str).to_dict(orient='records')
+            return df, '', '', '' # Nothing to detect; the caller reports the empty sheet
 
         # Auto-detect primary column name: Use the first column header found
         primary_column_name = df.columns[0]
         if not primary_column_name:
-            st.error(f"Could not detect primary column name in {file_name}. Make sure the sheet has headers.")
-            return [], '', ''
+            return pd.DataFrame(), '', '', f"Could not detect primary column name in {file_name}. Make sure the sheet has headers."
 
-        # Auto-detect college column
+        # Auto-detect college column: only inspect the headers naming a college keyword
         auto_detected_college_col = ''
-        college_keywords = ['college', 'university', 'institution', 'school', 'uni']
-
-        for header in df.columns:
-            lower_header = str(header).lower()
-            if any(keyword in lower_header for keyword in college_keywords):
-                # Check if this column actually contains non-empty values for at least some rows
-                if df[header].dropna().empty:
-                    continue # Skip if column is entirely empty after dropping NA
-                
-                # Check if the column is not just numeric (e.g., student IDs)
-                if pd.api.types.is_numeric_dtype(df[header]) and not df[header].astype(str).str.contains('[a-zA-Z]').any():
-                    continue # Skip if it looks like only numeric IDs
+        candidate_cols = [header for header in df.columns if COLLEGE_KW_RE.search(str(header))]
+
+        for header in candidate_cols:
+            column = df[header]
+
+            # Check if this column actually contains non-empty values for at least some rows
+            if not column.notna().any():
+                continue # Skip if column is entirely empty
 
-                auto_detected_college_col = header
-                break  # Found a suitable college column, take the first one
+            # Check if the column is not just numeric (e.g., student IDs); a numeric dtype cannot hold letters
+            if pd.api.types.is_numeric_dtype(column):
+                continue # Skip if it looks like only numeric IDs
 
-        message_type = "People" if is_people_file else "Team Heads"
-        st.info(f"Loaded {len(json_data)} {message_type} from '{file_name}' using primary column **'{primary_column_name}'**.")
+            auto_detected_college_col = header
+            break  # Found a suitable college column, take the first one
+
+        # Normalize the college column once per upload; blank values become missing and are left out of the groups
         if auto_detected_college_col:
-            st.info(f"Auto-detected college column: **'{auto_detected_college_col}'**.")
-        else:
-            st.warning(f"No college column auto-detected for {message_type} file. Grouping will be general if no college columns are found in both files.")
+            df[NORM_COLLEGE_COL] = df[auto_detected_college_col].astype('string').str.strip().str.lower().replace('', pd.NA)
 
-        return json_data, primary_column_name, auto_detected_college_col
+        return df, primary_column_name, auto_detected_college_col, ''
 
     except Exception as e:
-        st.error(f"Error processing {uploaded_file.name}: {e}")
-        return [], '', ''
+        return pd.DataFrame(), '', '', f"Error processing {file_name}: {e}"
+
+def read_excel_file(uploaded_file, sheet_name_input, is_people_file):
+    """
+    Reads an Excel or CSV file and returns its data as a DataFrame,
+    the primary column name, and the auto-detected college column name.
+    """
+    file_name = uploaded_file.name
+    df, primary_column_name, auto_detected_college_col, error_message = _parse(uploaded_file.getvalue(), file_name, sheet_name_input)
+    if error_message:
+        st.error(error_message)
+        return pd.DataFrame(), '', ''
+    if df.empty:
+        st.error(f"No data found in {file_name}.")
+        return pd.DataFrame(), '', ''
+
+    message_type = "People" if is_people_file else "Team Heads"
+    st.info(f"Loaded {len(df)} {message_type} from '{file_name}' using primary column **'{primary_column_name}'**.")
+    if auto_detected_college_col:
+        st.info(f"Auto-detected college column: **'{auto_detected_college_col}'**.")
+    else:
+        st.warning(f"No college column auto-detected for {message_type} file. Grouping will be general if no college columns are found in both files.")
+
+    return df, primary_column_name, auto_detected_college_col
+
+def even_counts(num_people, num_heads):
+    """
+    Returns how many people each of `num_heads` heads gets when `num_people` are split evenly:
+    every head gets the base count and the first `remainder` heads get one extra.
+    """
+    counts = np.full(num_heads, num_people // num_heads)
+    counts[:num_people % num_heads] += 1
+    return counts
+
+def build_grouped_frame(heads_df, people_df, head_chunks, person_chunks, head_status, member_status):
+    """
+    Builds the grouped output table from parallel chunks of head and person row positions.
+    A position of -1 leaves that side of the row empty. The status lists hold one entry per chunk
+    (None for no status), written to the 'Team Head - Status' or 'Group Member - Status' column.
+    """
+    head_idx = np.concatenate(head_chunks).astype(np.intp)
+    person_idx = np.concatenate(person_chunks).astype(np.intp)
+    chunk_lengths = [len(chunk) for chunk in head_chunks]
+
+    heads_df = heads_df.drop(columns=NORM_COLLEGE_COL, errors='ignore')
+    people_df = people_df.drop(columns=NORM_COLLEGE_COL, errors='ignore')
+
+    # Prefix the column names once per table, then gather rows by position (-1 becomes an empty row)
+    parts = {
+        'head': heads_df.add_prefix(HEAD_PREFIX).reindex(head_idx).reset_index(drop=True),
+        'member': people_df.add_prefix(MEMBER_PREFIX).reindex(person_idx).reset_index(drop=True),
+    }
+
+    # Status columns are expanded from the per-chunk entries only when some chunk has one
+    for statuses, part, column_name in ((member_status, 'member_status', f"{MEMBER_PREFIX}Status"), (head_status, 'head_status', f"{HEAD_PREFIX}Status")):
+        if any(status is not None for status in statuses):
+            parts[part] = pd.Series(np.repeat(np.array(statuses, dtype=object), chunk_lengths), name=column_name)
+
+    # Order the column blocks by first appearance, as a table built row by row would: a member-status
+    # row holds head columns then the member status, a head-status row the head status then member columns
+    part_order = {}
+    for head_row_status, member_row_status in zip(head_status, member_status):
+        if head_row_status is not None:
+            row_parts = ('head_status', 'member')
+        elif member_row_status is not None:
+            row_parts = ('head', 'member_status')
+        else:
+            row_parts = ('head', 'member')
+        for part in row_parts:
+            part_order.setdefault(part)
+        if len(part_order) == len(parts):
+            break
+
+    return pd.concat([parts[part] for part in part_order], axis=1)
+
+def _excel_cell_values(column):
+    """
+    Converts a column slice to an object array for xlsxwriter: missing values become None (blank
+    cells) and infinities the text 'inf' / '-inf', like to_excel's inf_rep. The conversion happens
+    on the numpy array, so no pandas step can downcast the values afterwards.
+    """
+    values = column.to_numpy(dtype=object, copy=True)
+    values[column.isna().to_numpy()] = None
+    values[values == np.inf] = 'inf'
+    values[values == -np.inf] = '-inf'
+    return values
+
+def write_grouped_excel(output_df, output):
+    """
+    Writes the grouped table to an xlsx workbook in `output` using xlsxwriter's constant_memory mode.
+    That mode flushes each row once the next one is started, so rows are written strictly in order
+    here; pandas' to_excel writes column by column and would lose cells.
+    Strings are always written as plain text, without URL, formula or number detection.
+    Dates, datetimes and infinite values are written the way pandas' to_excel writes them.
+    """
+    # The with block closes the workbook, and its constant_memory temp file, even when a write fails
+    with xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'remove_timezone': True, # Excel has no timezones; the pyarrow CSV reader parses ISO-8601 offsets as tz-aware
+        'strings_to_urls': False,
+        'strings_to_formulas': False,
+        'strings_to_numbers': False,
+    }) as workbook:
+        worksheet = workbook.add_worksheet("Grouped Teams")
+
+        # Same header style as pandas' to_excel
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        worksheet.write_row(0, 0, output_df.columns, header_format)
+
+        # Plain dates get a date-only format; datetimes keep the workbook's default datetime format
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+        worksheet.add_write_handler(datetime.date, lambda sheet, row, col, value, cell_format=None: sheet.write_datetime(row, col, value, date_format))
+
+        # Convert and write in row slices, so only one batch of Python objects is alive at a time
+        for start in range(0, len(output_df), EXCEL_WRITE_BATCH_ROWS):
+            batch = output_df.iloc[start:start + EXCEL_WRITE_BATCH_ROWS]
+            columns = [_excel_cell_values(batch.iloc[:, i]) for i in range(batch.shape[1])]
+            for row_number, row in enumerate(zip(*columns), start=start + 1):
+                worksheet.write_row(row_number, 0, row)
 
 st.set_page_config(layout="centered", page_title="Excel/CSV Grouping Tool")
 
@@ -84,12 +253,12 @@ people_file = st.file_uploader("Upload People File (e.g., 1200 people)", type=["
 people_sheet_name = st.text_input("People Sheet Name (e.g., Sheet1) - Ignored for CSV", value="Sheet1", key="people_sheet")
 st.markdown("<p style='font-size: small; color: gray;'>For Excel, specify sheet name. For CSV, the entire file is treated as one sheet. The first column will be used for people's names. College column will be auto-detected.</p>", unsafe_allow_html=True)
 
-people_data = []
+people_df = pd.DataFrame()
 people_primary_column_used = ''
 people_auto_detected_college_column = ''
 
 if people_file:
-    people_data, people_primary_column_used, people_auto_detected_college_column = read_excel_file(people_file, people_sheet_name, True)
+    people_df, people_primary_column_used, people_auto_detected_college_column = read_excel_file(people_file, people_sheet_name, True)
 
 st.write("---")
 
@@ -99,27 +268,45 @@ heads_file = st.file_uploader("Upload Team Heads File (e.g., 80 heads)", type=["
 heads_sheet_name = st.text_input("Heads Sheet Name (e.g., Sheet1) - Ignored for CSV", value="Sheet1", key="heads_sheet")
 st.markdown("<p style='font-size: small; color: gray;'>For Excel, specify sheet name. For CSV, the entire file is treated as one sheet. The first column will be used for team head names. College column will be auto-detected.</p>", unsafe_allow_html=True)
 
-heads_data = []
+heads_df = pd.DataFrame()
 heads_primary_column_used = ''
 heads_auto_detected_college_column = ''
 
 if heads_file:
-    heads_data, heads_primary_column_used, heads_auto_detected_college_column = read_excel_file(heads_file, heads_sheet_name, False)
+    heads_df, heads_primary_column_used, heads_auto_detected_college_column = read_excel_file(heads_file, heads_sheet_name, False)
+
+st.write("---")
+
+## Download Format
+st.subheader("3. Choose Download Format")
+download_format = st.selectbox("Download format", list(DOWNLOAD_FORMATS), key="download_format")
+st.markdown("<p style='font-size: small; color: gray;'>Excel is the default. Parquet and Feather are much faster to write and smaller, and load directly into pandas for further analysis.</p>", unsafe_allow_html=True)
 
 st.write("---")
 
 ## Process Button
 if st.button("Process and Group", type="primary"):
-    if not people_data:
+    if people_df.empty:
         st.error('Please upload the People Excel/CSV sheet and ensure data is loaded.')
-    elif not heads_data:
+    elif heads_df.empty:
         st.error('Please upload the Team Heads Excel/CSV sheet and ensure data is loaded.')
     else:
-        grouped_results = []
-        assigned_people_identifiers = set()
-
-        def get_identifier(item, primary_column):
-            return item.get(primary_column) # Use .get to handle cases where column might be missing
+        # Each output row is a (head position, person position) pair; -1 marks an empty side.
+        # Rows are collected as array chunks, with one status entry per chunk, and concatenated once at the end.
+        head_idx = []
+        person_idx = []
+        head_status = []
+        member_status = []
+        assigned = np.zeros(len(people_df), dtype=bool) # Row mask of people placed in a group
+
+        def add_rows(head_rows, person_rows, head_row_status=None, member_row_status=None):
+            head_rows, person_rows = np.broadcast_arrays(np.atleast_1d(head_rows), np.atleast_1d(person_rows))
+            if not len(head_rows):
+                return # Skip empty chunks so their status does not create an empty status column
+            head_idx.append(head_rows)
+            person_idx.append(person_rows)
+            head_status.append(head_row_status)
+            member_status.append(member_row_status)
 
         st.subheader("Grouping Results")
 
@@ -127,195 +314,90 @@ if st.button("Process and Group", type="primary"):
         if people_auto_detected_college_column and heads_auto_detected_college_column:
             st.info("Attempting college-based grouping...")
 
-            people_by_college = {}
-            for person in people_data:
-                college = person.get(people_auto_detected_college_column)
-                if college and str(college).strip() != '':
-                    normalized_college = str(college).strip().lower()
-                    if normalized_college not in people_by_college:
-                        people_by_college[normalized_college] = []
-                    people_by_college[normalized_college].append(person)
-
-            heads_by_college = {}
-            for head in heads_data:
-                college = head.get(heads_auto_detected_college_column)
-                if college and str(college).strip() != '':
-                    normalized_college = str(college).strip().lower()
-                    if normalized_college not in heads_by_college:
-                        heads_by_college[normalized_college] = []
-                    heads_by_college[normalized_college].append(head)
-
-            processed_heads_identifiers = set() # To track heads that have been processed
+            # Row positions per normalized college (computed at load time), in order of first appearance
+            people_by_college = people_df.groupby(NORM_COLLEGE_COL, sort=False).indices
+            heads_by_college = heads_df.groupby(NORM_COLLEGE_COL, sort=False).indices
+
+            processed_heads = np.zeros(len(heads_df), dtype=bool) # Row mask of heads that have been processed
 
             for college_name, heads_in_college in heads_by_college.items():
-                people_in_college = people_by_college.get(college_name, [])
-
-                if heads_in_college and people_in_college:
-                    num_people_in_college = len(people_in_college)
-                    num_heads_in_college = len(heads_in_college)
-                    base_per_head = num_people_in_college // num_heads_in_college
-                    remainder = num_people_in_college % num_heads_in_college
-
-                    current_people_index_in_college = 0
-                    for head in heads_in_college:
-                        head_id = get_identifier(head, heads_primary_column_used)
-                        if head_id is not None:
-                            processed_heads_identifiers.add(head_id)
-
-                        count_for_this_head = base_per_head
-                        if remainder > 0:
-                            count_for_this_head += 1
-                            remainder -= 1
-
-                        if count_for_this_head == 0:
-                            row = {}
-                            for key, value in head.items():
-                                row[f"Team Head - {key}"] = value
-                            row['Group Member - Status'] = f"No members assigned from {college_name}"
-                            grouped_results.append(row)
-                        else:
-                            for _ in range(count_for_this_head):
-                                if current_people_index_in_college < num_people_in_college:
-                                    member = people_in_college[current_people_index_in_college]
-                                    member_id = get_identifier(member, people_primary_column_used)
-
-                                    if member_id is not None and member_id not in assigned_people_identifiers:
-                                        row = {}
-                                        for key, value in head.items():
-                                            row[f"Team Head - {key}"] = value
-                                        for key, value in member.items():
-                                            row[f"Group Member - {key}"] = value
-                                        grouped_results.append(row)
-                                        assigned_people_identifiers.add(member_id)
-                                    current_people_index_in_college += 1
-                                else:
-                                    break
-                elif heads_in_college: # Heads in this college but no people from this college
-                    for head in heads_in_college:
-                        head_id = get_identifier(head, heads_primary_column_used)
-                        if head_id is not None:
-                            processed_heads_identifiers.add(head_id)
-                        row = {}
-                        for key, value in head.items():
-                            row[f"Team Head - {key}"] = value
-                        row['Group Member - Status'] = f"No members from {college_name} assigned to this head"
-                        grouped_results.append(row)
+                people_in_college = people_by_college.get(college_name, np.empty(0, dtype=np.intp))
+
+                if len(heads_in_college) and len(people_in_college):
+                    processed_heads[heads_in_college] = True
+
+                    counts = even_counts(len(people_in_college), len(heads_in_college))
+                    add_rows(np.repeat(heads_in_college, counts), people_in_college)
+                    assigned[people_in_college] = True
+
+                    add_rows(heads_in_college[counts == 0], -1, member_row_status=f"No members assigned from {college_name}")
+                elif len(heads_in_college): # Heads in this college but no people from this college
+                    processed_heads[heads_in_college] = True
+                    add_rows(heads_in_college, -1, member_row_status=f"No members from {college_name} assigned to this head")
             
             # Handle heads who were not processed because their college had no people or no college info
-            for head in heads_data:
-                head_id = get_identifier(head, heads_primary_column_used)
-                if head_id is not None and head_id not in processed_heads_identifiers:
-                    row = {}
-                    for key, value in head.items():
-                        row[f"Team Head - {key}"] = value
-                    row['Group Member - Status'] = "No members assigned (No college match or college info)"
-                    grouped_results.append(row)
+            unprocessed_heads = np.flatnonzero(~processed_heads)
+            add_rows(unprocessed_heads, -1, member_row_status="No members assigned (No college match or college info)")
 
             # Handle people who were not assigned (either no college info, or no head in their college, or couldn't be evenly distributed within college)
-            unassigned_people = [person for person in people_data if get_identifier(person, people_primary_column_used) not in assigned_people_identifiers]
+            unassigned_people = np.flatnonzero(~assigned)
 
-            if unassigned_people:
+            if len(unassigned_people):
                 st.warning(f"{len(unassigned_people)} people could not be assigned based on college grouping. Attempting to assign them generally.")
                 
                 # Create a list of heads who still have capacity (or all heads if some are empty)
-                available_heads = [head for head in heads_data if get_identifier(head, heads_primary_column_used) not in processed_heads_identifiers]
-                if not available_heads: # If all heads processed, cycle through all heads again for remaining people
-                    available_heads = heads_data
-
-                if available_heads:
-                    head_index = 0
-                    for person in unassigned_people:
-                        if head_index >= len(available_heads):
-                            head_index = 0 # Cycle back to the beginning of available heads
-                        
-                        head_to_assign = available_heads[head_index]
-                        row = {}
-                        for key, value in head_to_assign.items():
-                            row[f"Team Head - {key}"] = value
-                        for key, value in person.items():
-                            row[f"Group Member - {key}"] = value
-                        grouped_results.append(row)
-                        head_index += 1
+                available_heads = unprocessed_heads
+                if not len(available_heads): # If all heads processed, cycle through all heads again for remaining people
+                    available_heads = np.arange(len(heads_df))
+
+                if len(available_heads):
+                    # Round-robin: the n-th unassigned person goes to available head n modulo the number of heads
+                    add_rows(available_heads[np.arange(len(unassigned_people)) % len(available_heads)], unassigned_people)
                 else:
                     st.warning("No heads available for general assignment of remaining people.")
-                    for person in unassigned_people:
-                        row = {'Team Head - Status': 'UNASSIGNED (No matching college head or no available head)'}
-                        for key, value in person.items():
-                            row[f"Group Member - {key}"] = value
-                        grouped_results.append(row)
+                    add_rows(-1, unassigned_people, head_row_status='UNASSIGNED (No matching college head or no available head)')
 
         else:
             st.info('No matching college columns detected or missing in one of the files, performing general grouping.')
-            num_people = len(people_data)
-            num_heads = len(heads_data)
+            num_people = len(people_df)
+            num_heads = len(heads_df)
 
             if num_heads == 0:
                 st.error('Error: No team heads found. Cannot create groups.')
                 st.stop()
 
-            base_per_head = num_people // num_heads
-            remainder = num_people % num_heads
-
-            people_index = 0
-
-            for i in range(num_heads):
-                head = heads_data[i]
-                count_for_this_head = base_per_head
-                if remainder > 0:
-                    count_for_this_head += 1
-                    remainder -= 1
-
-                if count_for_this_head == 0:
-                    row = {}
-                    for key, value in head.items():
-                        row[f"Team Head - {key}"] = value
-                    row['Group Member - Status'] = 'No members assigned'
-                    grouped_results.append(row)
-                else:
-                    for j in range(count_for_this_head):
-                        if people_index < num_people:
-                            member = people_data[people_index]
-                            row = {}
-
-                            for key, value in head.items():
-                                row[f"Team Head - {key}"] = value
-
-                            for key, value in member.items():
-                                row[f"Group Member - {key}"] = value
-                            grouped_results.append(row)
-                            people_index += 1
-                        else:
-                            break
-            
-            # Add any remaining unassigned people
-            while people_index < num_people:
-                person = people_data[people_index]
-                row = {'Team Head - Status': 'UNASSIGNED (No more heads available)'}
-                for key, value in person.items():
-                    row[f"Group Member - {key}"] = value
-                grouped_results.append(row)
-                people_index += 1
+            # People are taken in file order; heads with a zero count (more heads than people) come last
+            counts = even_counts(num_people, num_heads)
+            add_rows(np.repeat(np.arange(num_heads), counts), np.arange(num_people))
+            add_rows(np.flatnonzero(counts == 0), -1, member_row_status='No members assigned')
 
+        # Build the output table in one vectorized pass instead of one dict per row
+        output_df = build_grouped_frame(heads_df, people_df, head_idx, person_idx, head_status, member_status)
 
-        if not grouped_results:
+        if output_df.empty:
             st.warning('No groups were formed. Check your input data.')
         else:
-            # Create a DataFrame from the grouped results
-            output_df = pd.DataFrame(grouped_results)
-
-            # Generate Excel file in memory
+            # Generate the download file in memory
+            format_label, download_file_name, download_mime = DOWNLOAD_FORMATS[download_format]
             output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                output_df.to_excel(writer, sheet_name="Grouped Teams", index=False)
-                # The 'with' statement handles saving and closing automatically.
-                # No need for writer.save()
-            output.seek(0) # Rewind to the beginning of the stream
-
-            st.success('Grouping complete! Download your Excel file below.')
-            st.download_button(
-                label="Download Grouped Teams Excel",
-                data=output,
-                file_name="grouped_teams.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="download_button"
-            )
\ No newline at end of file
+            try:
+                if download_format in ('parquet', 'feather'):
+                    # Arrow needs one type per column; object columns can mix numbers and text (e.g. roll numbers 1, 'A2')
+                    arrow_df = output_df.astype({column: 'string' for column in output_df.columns[output_df.dtypes == object]})
+                    if download_format == 'parquet':
+                        arrow_df.to_parquet(output, engine='pyarrow', compression='snappy', index=False)
+                    else:
+                        arrow_df.to_feather(output)
+                else:
+                    write_grouped_excel(output_df, output)
+            except Exception as e:
+                st.error(f"Error writing the {format_label} file: {e}")
+            else:
+                st.success(f'Grouping complete! Download your {format_label} file below.')
+                st.download_button(
+                    label=f"Download Grouped Teams {format_label}",
+                    data=output.getvalue(),
+                    file_name=download_file_name,
+                    mime=download_mime,
+                    key="download_button"
+                )
\ No newline at end of file